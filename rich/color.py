@@ -457,6 +457,7 @@ class Color(NamedTuple):
         return self
 
 
+@lru_cache(maxsize=1024)
 def parse_rgb_hex(hex_color: str) -> ColorTriplet:
     """Parse six hex characters in to RGB triplet."""
     assert len(hex_color) == 6, "must be 6 characters"
@@ -466,6 +467,7 @@ def parse_rgb_hex(hex_color: str) -> ColorTriplet:
     return color
 
 
+@lru_cache(maxsize=1024)
 def blend_rgb(
     color1: ColorTriplet, color2: ColorTriplet, cross_fade: float = 0.5
 ) -> ColorTriplet:
@@ -1,26 +1,99 @@
+from functools import lru_cache
+from itertools import islice
 import platform
 import textwrap
-from typing import Any, Dict, Optional, Set, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type, Union
 
+from pygments.lexer import Lexer
 from pygments.lexers import get_lexer_by_name, guess_lexer_for_filename
 from pygments.styles import get_style_by_name
 from pygments.style import Style as PygmentsStyle
 from pygments.token import Token
 from pygments.util import ClassNotFound
 
+from .cells import cell_len
 from .color import Color, parse_rgb_hex, blend_rgb
 from .console import Console, ConsoleOptions, RenderResult, Segment, ConsoleRenderable
 from .measure import Measurement
 from .style import Style
-from .text import Text
-from ._tools import iter_first
+from .text import Span, Text
 
 WINDOWS = platform.system() == "Windows"
 DEFAULT_THEME = "monokai"
+GUESS_LEXER_CODE_SIZE = 4096
+
+
+@lru_cache(maxsize=256)
+def _get_lexer(lexer_name: str) -> Lexer:
+    """Get a (cached) Pygments lexer from its name.
+
+    Args:
+        lexer_name (str): Name of the lexer.
+
+    Raises:
+        ClassNotFound: If no lexer matches the name.
+
+    Returns:
+        Lexer: A Pygments lexer instance.
+    """
+    return get_lexer_by_name(lexer_name)
+
+
+class _StyleTable(Dict[Any, Style]):
+    """Maps Pygments token types on to Styles, resolving unknown token types on demand.
+
+    Args:
+        pygments_style_class (Type[PygmentsStyle]): Pygments style class.
+    """
+
+    def __init__(self, pygments_style_class: Type[PygmentsStyle]) -> None:
+        self._pygments_style_class = pygments_style_class
+        self._background_color = pygments_style_class.background_color
+        super().__init__()
+        for token_type, pygments_style in pygments_style_class:
+            self[token_type] = self._make_style(pygments_style)
+
+    def _make_style(self, pygments_style: Dict[str, Any]) -> Style:
+        """Convert a Pygments style dict in to a Style."""
+        color = pygments_style["color"]
+        bgcolor = pygments_style["bgcolor"]
+        return Style(
+            color="#" + color if color else "#000000",
+            bgcolor="#" + bgcolor if bgcolor else self._background_color,
+            bold=pygments_style["bold"],
+            italic=pygments_style["italic"],
+            underline=pygments_style["underline"],
+        )
+
+    def __missing__(self, token_type: Any) -> Style:
+        try:
+            pygments_style = self._pygments_style_class.style_for_token(token_type)
+        except KeyError:
+            style = Style()
+        else:
+            style = self._make_style(pygments_style)
+        self[token_type] = style
+        return style
+
+
+@lru_cache(maxsize=64)
+def _get_style_table(pygments_style_class: Type[PygmentsStyle]) -> _StyleTable:
+    """Get a (cached) style table for a Pygments style class.
+
+    Args:
+        pygments_style_class (Type[PygmentsStyle]): Pygments style class.
+
+    Returns:
+        _StyleTable: A style table shared by all Syntax objects using the style.
+    """
+    return _StyleTable(pygments_style_class)
 
 
 class Syntax:
     """Construct a Syntax object to render syntax highlighted code.
+
+    The highlighted code is cached after the first render, so the code should be
+    considered immutable. Assigning a new value to ``code`` will re-highlight.
     
     Args:
         code (str): Code to highlight.
@@ -35,6 +108,29 @@ class Syntax:
         tab_size (int, optional): Size of tabs. Defaults to 4.
     """
 
+    __slots__ = [
+        "_code",
+        "_lexer_code",
+        "_line_count",
+        "lexer_name",
+        "dedent",
+        "line_numbers",
+        "start_line",
+        "line_range",
+        "highlight_lines",
+        "code_width",
+        "tab_size",
+        "_pygments_style_class",
+        "_background_color",
+        "_style_cache",
+        "_number_styles_cache",
+        "_line_headers_key",
+        "_line_headers",
+        "_highlight_key",
+        "_highlighted_text",
+        "__weakref__",
+    ]
+
     def __init__(
         self,
         code: str,
@@ -49,7 +145,7 @@ class Syntax:
         code_width: Optional[int] = None,
         tab_size: int = 4,
     ) -> None:
-        self.code = code
+        self.code = textwrap.dedent(code) if dedent else code
         self.lexer_name = lexer_name
         self.dedent = dedent
         self.line_numbers = line_numbers
@@ -59,7 +155,6 @@ class Syntax:
         self.code_width = code_width
         self.tab_size = tab_size
 
-        self._style_cache: Dict[Any, Style] = {}
         if not isinstance(theme, str) and issubclass(theme, PygmentsStyle):
             self._pygments_style_class = theme
         else:
@@ -68,6 +163,34 @@ class Syntax:
             except ClassNotFound:
                 self._pygments_style_class = get_style_by_name("default")
         self._background_color = self._pygments_style_class.background_color
+        self._style_cache = _get_style_table(self._pygments_style_class)
+        self._number_styles_cache: Dict[Optional[str], Tuple[Style, Style, Style]] = {}
+        self._line_headers_key: Optional[Tuple[Optional[str], int, int]] = None
+        self._line_headers: Optional[
+            Tuple[List[Tuple[Segment, Segment]], List[Tuple[Segment, Segment]]]
+        ] = None
+        self._highlight_key: Optional[Tuple[str, str, int]] = None
+        self._highlighted_text: Optional[Text] = None
+
+    @property
+    def code(self) -> str:
+        """Get the code to highlight."""
+        return self._code
+
+    @code.setter
+    def code(self, code: str) -> None:
+        self._code = code
+        # Preprocess the code as Pygments' get_tokens would
+        lexer_code = code
+        if lexer_code.startswith("\ufeff"):
+            lexer_code = lexer_code[1:]
+        if "\r" in lexer_code:
+            lexer_code = lexer_code.replace("\r\n", "\n").replace("\r", "\n")
+        lexer_code = lexer_code.strip("\n")
+        if not lexer_code.endswith("\n"):
+            lexer_code += "\n"
+        self._lexer_code = lexer_code
+        self._line_count = lexer_code.count("\n")
 
     @classmethod
     def from_path(
@@ -104,7 +227,9 @@ class Syntax:
         with open(path, "rt", encoding=encoding) as code_file:
             code = code_file.read()
         try:
-            lexer = guess_lexer_for_filename(path, code)
+            # Candidate lexers are selected by filename and the code is only used to
+            # choose between them, so a leading slice is enough to guess from
+            lexer = guess_lexer_for_filename(path, code[:GUESS_LEXER_CODE_SIZE])
             lexer_name = lexer.name
         except ClassNotFound:
             lexer_name = "default"
@@ -121,45 +246,64 @@ class Syntax:
         )
 
     def _get_theme_style(self, token_type) -> Style:
-        if token_type in self._style_cache:
-            style = self._style_cache[token_type]
-        else:
-            try:
-                pygments_style = self._pygments_style_class.style_for_token(token_type)
-            except KeyError:
-                style = Style()
-            else:
-                color = pygments_style["color"]
-                bgcolor = pygments_style["bgcolor"]
-                style = Style(
-                    color="#" + color if color else "#000000",
-                    bgcolor="#" + bgcolor if bgcolor else self._background_color,
-                    bold=pygments_style["bold"],
-                    italic=pygments_style["italic"],
-                    underline=pygments_style["underline"],
-                )
-            self._style_cache[token_type] = style
-
-        return style
+        return self._style_cache[token_type]
 
     def _get_default_style(self) -> Style:
         style = self._get_theme_style(Token.Text)
         style = style + Style(bgcolor=self._pygments_style_class.background_color)
         return style
 
+    def _get_plain_text(self) -> Text:
+        """Get the code as Text without highlighting."""
+        return Text(self._lexer_code, justify="left", tab_size=self.tab_size)
+
     def _highlight(self, lexer_name: str) -> Text:
+        highlight_key = (self.code, lexer_name, self.tab_size)
+        if self._highlighted_text is not None and self._highlight_key == highlight_key:
+            return self._highlighted_text
+        text = self._highlight_code(lexer_name)
+        self._highlight_key = highlight_key
+        self._highlighted_text = text
+        return text
+
+    def _highlight_code(self, lexer_name: str) -> Text:
         default_style = self._get_default_style()
         try:
-            lexer = get_lexer_by_name(lexer_name)
+            lexer = _get_lexer(lexer_name)
         except ClassNotFound:
             return Text(
-                self.code, justify="left", style=default_style, tab_size=self.tab_size
+                self._lexer_code,
+                justify="left",
+                style=default_style,
+                tab_size=self.tab_size,
             )
-        text = Text(justify="left", style=default_style, tab_size=self.tab_size)
-        append = text.append
-        _get_theme_style = self._get_theme_style
-        for token_type, token in lexer.get_tokens(self.code):
-            append(token, _get_theme_style(token_type))
+        style_table = self._style_cache
+        # Build the string and spans directly, rather than with Text.append per token.
+        # Runs of tokens with the same style are coalesced, to produce fewer spans.
+        pieces: List[str] = []
+        append_piece = pieces.append
+        spans: List[Span] = []
+        append_span = spans.append
+        offset = 0
+        run_start = 0
+        run_style = default_style
+        # Lex with get_tokens_unprocessed, which skips the filters in get_tokens. The
+        # code was preprocessed when it was set.
+        for _, token_type, token in lexer.get_tokens_unprocessed(self._lexer_code):
+            style = style_table[token_type]
+            if style is not run_style:
+                if offset > run_start:
+                    append_span(Span(run_start, offset, run_style))
+                run_start = offset
+                run_style = style
+            append_piece(token)
+            offset += len(token)
+        if offset > run_start:
+            append_span(Span(run_start, offset, run_style))
+        text = Text(
+            "".join(pieces), justify="left", style=default_style, tab_size=self.tab_size
+        )
+        text._spans[:] = spans
         return text
 
     def _get_line_numbers_color(self, blend: float = 0.3) -> Color:
@@ -180,27 +324,65 @@ class Syntax:
     def _numbers_column_width(self) -> int:
         """Get the number of characters used to render the numbers column."""
         if self.line_numbers:
-            return len(str(self.start_line + self.code.count("\n"))) + 2
+            return len(str(self.start_line + self._line_count)) + 2
         return 0
 
     def _get_number_styles(self, console: Console) -> Tuple[Style, Style, Style]:
         """Get background, number, and highlight styles for line numbers."""
+        color_system = console.color_system
+        number_styles = self._number_styles_cache.get(color_system)
+        if number_styles is None:
+            number_styles = self._number_styles_cache[
+                color_system
+            ] = self._make_number_styles(color_system)
+        return number_styles
+
+    def _make_number_styles(
+        self, color_system: Optional[str]
+    ) -> Tuple[Style, Style, Style]:
         background_style = Style(bgcolor=self._pygments_style_class.background_color)
-        if console.color_system in ("256", "truecolor"):
-            number_style = Style.chain(
-                background_style,
-                self._get_theme_style(Token.Text),
-                Style(color=self._get_line_numbers_color()),
-            )
-            highlight_number_style = Style.chain(
-                background_style,
-                self._get_theme_style(Token.Text),
-                Style(bold=True, color=self._get_line_numbers_color(0.9)),
+        if color_system in ("256", "truecolor"):
+            text_style = background_style + self._get_theme_style(Token.Text)
+            number_style = text_style + Style(color=self._get_line_numbers_color())
+            highlight_number_style = text_style + Style(
+                bold=True, color=self._get_line_numbers_color(0.9)
             )
         else:
             number_style = highlight_number_style = Style()
         return background_style, number_style, highlight_number_style
 
+    def _get_line_headers(
+        self, console: Console
+    ) -> Tuple[List[Tuple[Segment, Segment]], List[Tuple[Segment, Segment]]]:
+        """Get Segments for the line numbers column, for normal and highlighted lines."""
+        line_headers_key = (console.color_system, self.start_line, self._line_count)
+        if self._line_headers_key == line_headers_key:
+            assert self._line_headers is not None
+            return self._line_headers
+        _, number_style, highlight_number_style = self._get_number_styles(console)
+        number_width = self._numbers_column_width - 2
+        line_columns = [
+            f"{line_no:>{number_width}} "
+            for line_no in range(
+                self.start_line, self.start_line + self._line_count + 1
+            )
+        ]
+        normal_pointer = Segment("  ", highlight_number_style)
+        highlight_pointer = Segment("❱ ", number_style)
+        line_headers = (
+            [
+                (normal_pointer, Segment(line_column, number_style))
+                for line_column in line_columns
+            ],
+            [
+                (highlight_pointer, Segment(line_column, highlight_number_style))
+                for line_column in line_columns
+            ],
+        )
+        self._line_headers_key = line_headers_key
+        self._line_headers = line_headers
+        return line_headers
+
     def __measure__(self, console: "Console", max_width: int) -> "Measurement":
         if self.code_width is not None:
             width = self.code_width + self._numbers_column_width
@@ -209,10 +391,11 @@ class Syntax:
 
     def __console__(self, console: Console, options: ConsoleOptions) -> RenderResult:
         code_width = options.max_width if self.code_width is None else self.code_width
-        code = self.code
-        if self.dedent:
-            code = textwrap.dedent(code)
-        text = self._highlight(self.lexer_name)
+        if console.color_system is None and not console.record:
+            # Styles aren't rendered without a color system, so skip highlighting
+            text = self._get_plain_text()
+        else:
+            text = self._highlight(self.lexer_name)
         if not self.line_numbers:
             if self.code_width is None:
                 yield text
@@ -222,49 +405,65 @@ class Syntax:
                 )
             return
 
-        lines = text.split("\n")
+        lines: Iterable[Text] = text.iter_lines("\n")
 
         line_offset = 0
+        line_count = self._line_count + 1
         if self.line_range:
             start_line, end_line = self.line_range
             line_offset = max(0, start_line - 1)
-            lines = lines[line_offset:end_line]
+            if end_line is not None:
+                line_count = min(line_count, end_line)
+            lines = islice(lines, line_offset, end_line)
 
         numbers_column_width = self._numbers_column_width
         render_options = options.update(width=code_width + numbers_column_width)
 
-        (
-            background_style,
-            number_style,
-            highlight_number_style,
-        ) = self._get_number_styles(console)
+        background_style, _, _ = self._get_number_styles(console)
 
-        highlight_line = self.highlight_lines.__contains__
         _Segment = Segment
         padding = _Segment(" " * numbers_column_width, background_style)
         new_line = _Segment("\n")
 
-        line_pointer = "❱ "
+        headers, highlight_headers = self._get_line_headers(console)
+        first_line_no = self.start_line + line_offset
+        highlight_flags = bytearray(max(0, line_count - line_offset))
+        for line_no in self.highlight_lines:
+            line_index = line_no - first_line_no
+            if 0 <= line_index < len(highlight_flags):
+                highlight_flags[line_index] = 1
 
-        for line_no, line in enumerate(lines, self.start_line + line_offset):
-            wrapped_lines = console.render_lines(
-                line, render_options, style=background_style
-            )
-            for first, wrapped_line in iter_first(wrapped_lines):
-                if first:
-                    line_column = str(line_no).rjust(numbers_column_width - 2) + " "
-                    if highlight_line(line_no):
-                        yield _Segment(line_pointer, number_style)
-                        yield _Segment(
-                            line_column, highlight_number_style,
-                        )
-                    else:
-                        yield _Segment("  ", highlight_number_style)
-                        yield _Segment(
-                            line_column, number_style,
-                        )
-                else:
-                    yield padding
+        render_width = render_options.max_width
+
+        for line_index, line in enumerate(lines):
+            line_text = line.text
+            line_cell_len = cell_len(line_text)
+            if line_cell_len <= render_width and "\t" not in line_text:
+                # Fast path for lines that don't need wrapping. _render_line skips
+                # wrap() and justify, which is safe as the line fits in render_width
+                # and has no tabs to expand. It does emit the line's end, so clear
+                # that as new_line is yielded below.
+                line.end = ""
+                line.pad_right(render_width - line_cell_len)
+                first_line = [
+                    _Segment(segment_text, background_style + style)
+                    for segment_text, style in line._render_line(
+                        line, console, render_options
+                    )
+                ]
+                wrapped_lines = []
+            else:
+                first_line, *wrapped_lines = console.render_lines(
+                    line, render_options, style=background_style
+                )
+            if highlight_flags[line_index]:
+                yield from highlight_headers[line_offset + line_index]
+            else:
+                yield from headers[line_offset + line_index]
+            yield from first_line
+            yield new_line
+            for wrapped_line in wrapped_lines:
+                yield padding
                 yield from wrapped_line
                 yield new_line
 
@@ -544,6 +544,77 @@ class Text:
                     line.right_crop(separator_length)
         return lines
 
+    def iter_lines(self, separator: str = "\n") -> Iterable["Text"]:
+        r"""Iterate over lines of rich text, preserving styles.
+
+        Equivalent to :meth:`split` (without separators), but generates lines one at a
+        time rather than building them all up front.
+
+        Args:
+            separator (str, optional): String to split on. Defaults to "\n".
+
+        Returns:
+            Iterable[Text]: An iterable of rich text, one per line of the original.
+        """
+        assert separator, "separator must not be empty"
+
+        text = self.text
+        if separator not in text:
+            yield self.copy()
+            return
+        text_length = len(text)
+        if text.endswith(separator):
+            text_length -= len(separator)
+        separator_length = len(separator)
+
+        spans = self._spans
+        span_order = sorted(range(len(spans)), key=lambda index: spans[index].start)
+        span_count = len(span_order)
+        span_position = 0
+        active_spans: List[Tuple[int, Span]] = []
+
+        style = self.style
+        justify = self.justify
+        line_start = 0
+        while line_start <= text_length:
+            line_end = text.find(separator, line_start, text_length)
+            if line_end == -1:
+                line_end = text_length
+            added = False
+            while (
+                span_position < span_count
+                and spans[span_order[span_position]].start < line_end
+            ):
+                index = span_order[span_position]
+                active_spans.append((index, spans[index]))
+                span_position += 1
+                added = True
+            if added:
+                active_spans.sort(key=itemgetter(0))
+
+            line = Text(
+                text[line_start:line_end],
+                style=style,
+                justify=justify,
+                end=self.end,
+                tab_size=self.tab_size,
+            )
+            line_spans = line._spans
+            remaining_spans: List[Tuple[int, Span]] = []
+            for index, span in active_spans:
+                start, end, span_style = span
+                if end > line_end + separator_length:
+                    remaining_spans.append((index, span))
+                start = max(start, line_start)
+                end = min(end, line_end)
+                if end > start:
+                    line_spans.append(
+                        Span(start - line_start, end - line_start, span_style)
+                    )
+            active_spans = remaining_spans
+            yield line
+            line_start = line_end + separator_length
+
     def divide(self, offsets: Iterable[int]) -> Lines:
         """Divide text in to a number of lines at given offsets.
 
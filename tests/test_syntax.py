@@ -0,0 +1,211 @@
+import io
+import re
+
+import pytest
+
+from rich.console import Console
+from rich.syntax import Syntax
+
+
+CODE = '''def loop_first_last(values):
+    """Iterate and generate a tuple with a flag for first and last value."""
+    iter_values = iter(values)
+    try:
+        previous_value = next(iter_values)
+    except StopIteration:
+        return
+'''
+
+
+def render(syntax, width=50, color_system="truecolor") -> str:
+    console = Console(file=io.StringIO(), width=width, color_system=color_system)
+    console.print(syntax)
+    return console.file.getvalue()
+
+
+def test_highlight_cached():
+    syntax = Syntax(CODE, "python")
+    text = syntax._highlight("python")
+    assert syntax._highlight("python") is text
+    assert render(syntax) == render(syntax)
+
+
+def test_highlight_code_changed():
+    syntax = Syntax(CODE, "python")
+    text = syntax._highlight("python")
+    syntax.code = "print('Hello')\n"
+    new_text = syntax._highlight("python")
+    assert new_text is not text
+    assert new_text.text == "print('Hello')\n"
+
+
+def test_numbers_column_width():
+    syntax = Syntax(CODE, "python", line_numbers=True)
+    assert syntax._numbers_column_width == 3
+    syntax.code = "x\n" * 120
+    assert syntax._numbers_column_width == 5
+    syntax.line_numbers = False
+    assert syntax._numbers_column_width == 0
+
+
+def test_style_table():
+    from pygments.token import Token
+
+    syntax = Syntax(CODE, "python", theme="monokai")
+    assert Token.Keyword in syntax._style_cache
+    custom_token = Token.Name.Foo.Bar
+    assert custom_token not in syntax._style_cache
+    style = syntax._get_theme_style(custom_token)
+    assert syntax._style_cache[custom_token] is style
+
+
+def test_style_table_shared():
+    syntax1 = Syntax("x = 1", "python", theme="monokai")
+    syntax2 = Syntax("y = 2", "python", theme="monokai")
+    assert syntax1._style_cache is syntax2._style_cache
+    syntax3 = Syntax("x = 1", "python", theme="default")
+    assert syntax3._style_cache is not syntax1._style_cache
+
+
+def test_highlight_coalesces_spans():
+    syntax = Syntax("foo  bar  baz\n", "python")
+    text = syntax._highlight("python")
+    assert str(text) == "foo  bar  baz\n"
+    styles = [span.style for span in text._spans]
+    assert all(style1 is not style2 for style1, style2 in zip(styles, styles[1:]))
+
+
+def test_highlight_strips_blank_lines():
+    syntax = Syntax("\n\nx = 1\r\n\n", "python")
+    assert str(syntax._highlight("python")) == "x = 1\n"
+    syntax = Syntax("\ufeff\nx = 1\n", "python", line_numbers=True)
+    assert str(syntax._highlight("python")) == "x = 1\n"
+    assert syntax._line_count == 1
+
+
+def test_carriage_returns_with_line_numbers():
+    syntax = Syntax("a = 1\rb = 2\r", "python", line_numbers=True, highlight_lines={2})
+    for color_system in (None, "standard", "truecolor"):
+        console = Console(file=io.StringIO(), width=20, color_system=color_system)
+        console.print(syntax)
+        lines = re.sub("\x1b\\[[0-9;]*m", "", console.file.getvalue()).splitlines()
+        assert len(lines) == 2
+        assert "1 a = 1" in lines[0]
+        assert "2 b = 2" in lines[1]
+
+
+def test_number_styles_cached():
+    syntax = Syntax(CODE, "python", line_numbers=True)
+    console = Console(file=io.StringIO(), color_system="truecolor")
+    number_styles = syntax._get_number_styles(console)
+    assert syntax._get_number_styles(console) is number_styles
+    standard_console = Console(file=io.StringIO(), color_system="standard")
+    assert syntax._get_number_styles(standard_console) is not number_styles
+
+
+def test_dedent():
+    code = "    def foo():\n        pass\n"
+    assert Syntax(code, "python").code == code
+    syntax = Syntax(code, "python", dedent=True)
+    assert syntax.code == "def foo():\n    pass\n"
+    assert str(syntax._highlight("python")) == "def foo():\n    pass\n"
+
+
+def test_no_color_skips_highlight():
+    syntax = Syntax(CODE, "python", line_numbers=True)
+    no_color = render(syntax, color_system=None)
+    assert syntax._highlighted_text is None
+    assert "\x1b" not in no_color
+    assert render(syntax, color_system="truecolor") != no_color
+    assert syntax._highlighted_text is not None
+
+
+def test_from_path(tmp_path):
+    path = tmp_path / "example.py"
+    path.write_text(CODE * 200)
+    syntax = Syntax.from_path(str(path))
+    assert syntax.lexer_name == "Python"
+    assert syntax.code == CODE * 200
+
+
+def test_line_headers_cached():
+    syntax = Syntax(CODE, "python", line_numbers=True, highlight_lines={2})
+    first_render = render(syntax)
+    line_headers = syntax._line_headers
+    assert line_headers is not None
+    assert len(line_headers[0]) == CODE.count("\n") + 1
+    assert render(syntax) == first_render
+    assert syntax._line_headers is line_headers
+    assert "❱" in first_render
+
+
+def test_highlight_tab_size_changed():
+    syntax = Syntax(CODE, "python", tab_size=4)
+    text = syntax._highlight("python")
+    syntax.tab_size = 8
+    new_text = syntax._highlight("python")
+    assert new_text is not text
+    assert new_text.tab_size == 8
+
+
+def test_no_reference_cycle():
+    import gc
+    import weakref
+
+    gc.disable()
+    try:
+        syntax = Syntax(CODE, "python", line_numbers=True)
+        render(syntax)
+        text_ref = weakref.ref(syntax._highlight("python"))
+        del syntax
+        assert text_ref() is None
+    finally:
+        gc.enable()
+
+
+def test_line_range_open_end():
+    syntax = Syntax(CODE, "python", line_numbers=True, line_range=(5, None))
+    lines = render(syntax, color_system=None).splitlines()
+    assert len(lines) == 3
+    assert lines[0].startswith("  5 ")
+
+
+# Lines with tabs, wide characters, and lines that wrap, next to lines that fit
+RENDER_CODE = 'def foo(x):\n\tif x:\n\t\treturn "你好世界"\n    s = "你好世界"\n    return "this line is long enough to need wrapping"\n'
+
+render_tests = [
+    {"line_numbers": True},
+    {"line_numbers": True, "highlight_lines": {11, 14}, "start_line": 10},
+    {"line_numbers": True, "line_range": (2, 4), "highlight_lines": {3}},
+]
+
+expected_plain = [
+    '  1 def foo(x):               \n  2     if x:                 \n  3         return "你好世界" \n  4     s = "你好世界"        \n  5     return "this line is l\n   enough to need wrapping"   \n',
+    '  10 def foo(x):              \n❱ 11     if x:                \n  12         return "你好世界"\n  13     s = "你好世界"       \n❱ 14     return "this line is \n    enough to need wrapping"  \n',
+    '  2     if x:                 \n❱ 3         return "你好世界" \n  4     s = "你好世界"        \n',
+]
+
+expected_truecolor = [
+    '\x1b[1;38;2;227;227;221;48;2;39;40;34m  \x1b[0m\x1b[38;2;101;102;96;48;2;39;40;34m1 \x1b[0m\x1b[38;2;102;217;239;48;2;39;40;34mdef\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;166;226;46;48;2;39;40;34mfoo\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m(\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34mx\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m):\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m               \x1b[0m\n\x1b[1;38;2;227;227;221;48;2;39;40;34m  \x1b[0m\x1b[38;2;101;102;96;48;2;39;40;34m2 \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m   \x1b[0m\x1b[38;2;102;217;239;48;2;39;40;34mif\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34mx\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m:\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m                 \x1b[0m\n\x1b[1;38;2;227;227;221;48;2;39;40;34m  \x1b[0m\x1b[38;2;101;102;96;48;2;39;40;34m3 \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m   \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m   \x1b[0m\x1b[38;2;102;217;239;48;2;39;40;34mreturn\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;230;219;116;48;2;39;40;34m"你好世界"\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\n\x1b[1;38;2;227;227;221;48;2;39;40;34m  \x1b[0m\x1b[38;2;101;102;96;48;2;39;40;34m4 \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m    \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34ms\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;255;70;137;48;2;39;40;34m=\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;230;219;116;48;2;39;40;34m"你好世界"\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m        \x1b[0m\n\x1b[1;38;2;227;227;221;48;2;39;40;34m  \x1b[0m\x1b[38;2;101;102;96;48;2;39;40;34m5 \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m    \x1b[0m\x1b[38;2;102;217;239;48;2;39;40;34mreturn\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;230;219;116;48;2;39;40;34m"this line is l\x1b[0m\n\x1b[48;2;39;40;34m   \x1b[0m\x1b[38;2;230;219;116;48;2;39;40;34menough to need wrapping"\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m   \x1b[0m\n',
+    '\x1b[1;38;2;227;227;221;48;2;39;40;34m  \x1b[0m\x1b[38;2;101;102;96;48;2;39;40;34m10 \x1b[0m\x1b[38;2;102;217;239;48;2;39;40;34mdef\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;166;226;46;48;2;39;40;34mfoo\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m(\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34mx\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m):\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m              \x1b[0m\n\x1b[38;2;101;102;96;48;2;39;40;34m❱ \x1b[0m\x1b[1;38;2;227;227;221;48;2;39;40;34m11 \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m   \x1b[0m\x1b[38;2;102;217;239;48;2;39;40;34mif\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34mx\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m:\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m                \x1b[0m\n\x1b[1;38;2;227;227;221;48;2;39;40;34m  \x1b[0m\x1b[38;2;101;102;96;48;2;39;40;34m12 \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m   \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m   \x1b[0m\x1b[38;2;102;217;239;48;2;39;40;34mreturn\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;230;219;116;48;2;39;40;34m"你好世界"\x1b[0m\n\x1b[1;38;2;227;227;221;48;2;39;40;34m  \x1b[0m\x1b[38;2;101;102;96;48;2;39;40;34m13 \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m    \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34ms\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;255;70;137;48;2;39;40;34m=\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;230;219;116;48;2;39;40;34m"你好世界"\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m       \x1b[0m\n\x1b[38;2;101;102;96;48;2;39;40;34m❱ \x1b[0m\x1b[1;38;2;227;227;221;48;2;39;40;34m14 \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m    \x1b[0m\x1b[38;2;102;217;239;48;2;39;40;34mreturn\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;230;219;116;48;2;39;40;34m"this line is \x1b[0m\n\x1b[48;2;39;40;34m    \x1b[0m\x1b[38;2;230;219;116;48;2;39;40;34menough to need wrapping"\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m  \x1b[0m\n',
+    '\x1b[1;38;2;227;227;221;48;2;39;40;34m  \x1b[0m\x1b[38;2;101;102;96;48;2;39;40;34m2 \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m   \x1b[0m\x1b[38;2;102;217;239;48;2;39;40;34mif\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34mx\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m:\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m                 \x1b[0m\n\x1b[38;2;101;102;96;48;2;39;40;34m❱ \x1b[0m\x1b[1;38;2;227;227;221;48;2;39;40;34m3 \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m   \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m   \x1b[0m\x1b[38;2;102;217;239;48;2;39;40;34mreturn\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;230;219;116;48;2;39;40;34m"你好世界"\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\n\x1b[1;38;2;227;227;221;48;2;39;40;34m  \x1b[0m\x1b[38;2;101;102;96;48;2;39;40;34m4 \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m    \x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34ms\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;255;70;137;48;2;39;40;34m=\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m \x1b[0m\x1b[38;2;230;219;116;48;2;39;40;34m"你好世界"\x1b[0m\x1b[38;2;248;248;242;48;2;39;40;34m        \x1b[0m\n',
+]
+
+
+@pytest.mark.parametrize("kwargs,expected", zip(render_tests, expected_plain))
+def test_render_line_numbers_plain(kwargs, expected):
+    syntax = Syntax(RENDER_CODE, "python", theme="monokai", **kwargs)
+    assert render(syntax, width=30, color_system=None) == expected
+
+
+@pytest.mark.parametrize("kwargs,expected", zip(render_tests, expected_truecolor))
+def test_render_line_numbers_truecolor(kwargs, expected):
+    syntax = Syntax(RENDER_CODE, "python", theme="monokai", **kwargs)
+    assert render(syntax, width=30, color_system="truecolor") == expected
+
+
+def test_weakref():
+    import weakref
+
+    syntax = Syntax(CODE, "python")
+    assert weakref.ref(syntax)() is syntax
@@ -190,6 +190,31 @@ def test_split():
     assert list(Text("foo").split("\n")) == [Text("foo")]
 
 
+def test_iter_lines():
+    test = Text()
+    test.append("foo", "red")
+    test.append("\n")
+    test.append("bar", "green")
+    test.append("\n")
+    assert list(test.iter_lines("\n")) == list(test.split("\n"))
+
+    test = Text("foo\n\nbar")
+    test.stylize(1, 6, "bold")
+    lines = list(test.iter_lines("\n"))
+    assert [str(line) for line in lines] == ["foo", "", "bar"]
+    assert lines[0]._spans == [Span(1, 3, "bold")]
+    assert lines[1]._spans == []
+    assert lines[2]._spans == [Span(0, 1, "bold")]
+
+    assert list(Text("foo").iter_lines("\n")) == [Text("foo")]
+
+    test = Text("foo\tbar\nbaz\negg", end="", tab_size=4)
+    test.stylize(0, 3, "bold")
+    for line in test.iter_lines("\n"):
+        assert line.tab_size == 4
+        assert line.end == ""
+
+
 def test_divide():
     lines = Text("foo").divide([])
     assert len(lines) == 1